@@ -1,14 +1,29 @@
 # app.py
 
+import gzip
+import hashlib
+import importlib
 import json
-import textwrap
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
 
 import streamlit as st
 
-from gemini_client import GeminiClient
-from data_parser import parse_input_data
-from visual_spec_generator import generate_visual_spec
-from renderer import render_visual_spec
+import disk_cache
+
+try:  # optional fast JSON; the stdlib covers everything if it's missing
+    import orjson
+except ImportError:
+    orjson = None
+
+# The Gemini SDK, file parsers, renderer and numpy are imported lazily inside
+# the helpers below, so a cold start doesn't pay for them before Generate.
+if TYPE_CHECKING:
+    from gemini_client import GeminiClient
 
 
 # -------------------------------
@@ -24,670 +39,43 @@ st.set_page_config(
 # -------------------------------
 # Custom CSS - Observable-inspired design
 # -------------------------------
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Global styles */
-    * {
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-    }
-    
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Main container with grid background */
-    .stApp {
-        background-color: #1a1a1a;
-        background-image: 
-            linear-gradient(rgba(255, 255, 255, 0.06) 1px, transparent 1px),
-            linear-gradient(90deg, rgba(255, 255, 255, 0.06) 1px, transparent 1px);
-        background-size: 50px 50px;
-    }
-    
-    /* Hero section */
-    .hero-section {
-        text-align: center;
-        padding: 0px 20px 25px 20px;
-        max-width: 1200px;
-        margin: 0 auto;
-        position: relative;
-    }
-    
-    .hero-title {
-        font-size: 3.5rem;
-        font-weight: 300;
-        color: #e5e7eb;
-        margin-bottom: 1.5rem;
-        line-height: 1.2;
-        letter-spacing: -0.02em;
-        position: relative;
-        display: inline-block;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Helvetica Neue', sans-serif;
-    }
-    
-    .spiral-container {
-        position: absolute;
-        top: -30px;
-        right: -60px;
-        width: 120px;
-        height: 120px;
-        opacity: 0.6;
-    }
-    
-    .spiral {
-        width: 100%;
-        height: 100%;
-        animation: spiral-rotate 20s linear infinite;
-    }
-    
-    @keyframes spiral-rotate {
-        from {
-            transform: rotate(0deg);
-        }
-        to {
-            transform: rotate(360deg);
-        }
-    }
-    
-    .hero-subtitle {
-        font-size: 1rem;
-        color: #9ca3af;
-        max-width: 900px;
-        margin: 0 auto 2rem auto;
-        line-height: 1.5;
-        font-weight: 400;
-        font-family: 'Courier New', Courier, monospace;
-        text-align: center;
-        letter-spacing: 0.02em;
-    }
-    
-    /* Data type selection grid */
-    .data-type-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
-        gap: 20px;
-        max-width: 1200px;
-        margin: 0 auto 50px auto;
-        padding: 0 20px;
-    }
-    
-    .data-type-card {
-        background: rgba(40, 40, 40, 0.3);
-        border: 1px solid rgba(255, 255, 255, 0.15);
-        border-radius: 0;
-        padding: 32px 24px 24px 24px;
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-        position: relative;
-        overflow: visible;
-        user-select: none;
-        margin-bottom: 12px;
-    }
-    
-    /* External corner points */
-    .data-type-card::before {
-        content: '';
-        position: absolute;
-        top: -4px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        transition: all 0.3s ease;
-    }
-    
-    .data-type-card::after {
-        content: '';
-        position: absolute;
-        top: -4px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        transition: all 0.3s ease;
-    }
-    
-    .data-type-card:hover {
-        border-color: #E07638;
-        border-width: 2px;
-        transform: translateY(-2px);
-        box-shadow: 0 8px 24px rgba(224, 118, 56, 0.15);
-        background: rgba(224, 118, 56, 0.05);
-    }
-    
-    .data-type-card:hover::before,
-    .data-type-card:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    .data-type-card.selected {
-        border-color: #E07638;
-        border-width: 2px;
-        background: rgba(224, 118, 56, 0.08);
-        box-shadow: 0 4px 16px rgba(224, 118, 56, 0.2);
-    }
-    
-    .data-type-card.selected::before,
-    .data-type-card.selected::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    .card-title {
-        font-size: 1.3rem;
-        font-weight: 400;
-        color: #e5e7eb;
-        margin-bottom: 14px;
-        letter-spacing: -0.01em;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Helvetica Neue', sans-serif;
-    }
-    
-    .card-description {
-        font-size: 0.9rem;
-        color: #9ca3af;
-        line-height: 1.6;
-        font-weight: 300;
-    }
-    
-    /* Remove button overlay styling */
-    .stButton {
-        margin-top: 16px !important;
-        position: relative !important;
-    }
-    
-    .stButton button {
-        background: rgba(224, 118, 56, 0.15) !important;
-        color: #e5e7eb !important;
-        border: 1px solid rgba(224, 118, 56, 0.3) !important;
-        border-radius: 0 !important;
-        padding: 12px 24px !important;
-        font-weight: 400 !important;
-        font-size: 0.9rem !important;
-        letter-spacing: 0.01em !important;
-        transition: all 0.3s ease !important;
-        width: 100% !important;
-        cursor: pointer !important;
-        position: relative !important;
-    }
-    
-    .stButton button:hover {
-        background: rgba(224, 118, 56, 0.25) !important;
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        color: #E07638 !important;
-        transform: translateY(-1px) !important;
-        box-shadow: 0 4px 12px rgba(224, 118, 56, 0.2) !important;
-    }
-    
-    .stButton button:active,
-    .stButton button:focus {
-        background: rgba(224, 118, 56, 0.2) !important;
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        color: #E07638 !important;
-    }
-    
-    /* Add corners to card buttons */
-    .stButton::before {
-        content: '';
-        position: absolute;
-        top: 16px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.6);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton::after {
-        content: '';
-        position: absolute;
-        top: 16px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.6);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton:hover::before,
-    .stButton:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    /* Selected state for button in selected card column */
-    div[data-testid="column"]:has(.data-type-card.selected) .stButton button {
-        background: rgba(224, 118, 56, 0.3) !important;
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        color: #E07638 !important;
-        box-shadow: 0 4px 12px rgba(224, 118, 56, 0.25) !important;
-    }
-    
-    div[data-testid="column"]:has(.data-type-card.selected) .stButton::before,
-    div[data-testid="column"]:has(.data-type-card.selected) .stButton::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    /* Input section */
-    .input-section {
-        max-width: 900px;
-        margin: 0 auto 50px auto;
-        padding: 0 20px;
-    }
-    
-    .section-title {
-        font-size: 0.75rem;
-        font-weight: 500;
-        color: #9ca3af;
-        margin-bottom: 16px;
-        text-transform: uppercase;
-        letter-spacing: 0.1em;
-    }
-    
-    /* Streamlit overrides */
-    .stTextArea {
-        position: relative !important;
-    }
-    
-    .stTextArea::before {
-        content: '';
-        position: absolute;
-        top: -4px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextArea::after {
-        content: '';
-        position: absolute;
-        top: -4px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextArea:focus-within::before,
-    .stTextArea:focus-within::after,
-    .stTextArea:hover::before,
-    .stTextArea:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    .stTextArea textarea {
-        background-color: rgba(40, 40, 40, 0.3) !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        border-radius: 0 !important;
-        color: #e5e7eb !important;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif !important;
-        font-size: 0.95rem !important;
-        font-weight: 300 !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stTextArea textarea:focus {
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        box-shadow: none !important;
-        background-color: rgba(224, 118, 56, 0.05) !important;
-    }
-    
-    .stTextArea textarea:hover {
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        background-color: rgba(224, 118, 56, 0.05) !important;
-    }
-    
-    .stTextInput {
-        position: relative !important;
-    }
-    
-    .stTextInput::before {
-        content: '';
-        position: absolute;
-        top: -4px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextInput::after {
-        content: '';
-        position: absolute;
-        top: -4px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextInput:focus-within::before,
-    .stTextInput:focus-within::after,
-    .stTextInput:hover::before,
-    .stTextInput:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    .stTextInput input {
-        background-color: rgba(40, 40, 40, 0.3) !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        border-radius: 0 !important;
-        color: #e5e7eb !important;
-        font-weight: 300 !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stTextInput input:focus {
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        box-shadow: none !important;
-        background-color: rgba(224, 118, 56, 0.05) !important;
-    }
-    
-    .stTextInput input:hover {
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        background-color: rgba(224, 118, 56, 0.05) !important;
-    }
-    
-    /* Generate Button - show only this one */
-    div[data-testid="column"]:nth-child(2) .stButton button {
-        display: block !important;
-        background: rgba(40, 40, 40, 0.3) !important;
-        color: #e5e7eb !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        border-radius: 0 !important;
-        padding: 14px 40px !important;
-        font-weight: 400 !important;
-        font-size: 1rem !important;
-        letter-spacing: 0.01em !important;
-        transition: all 0.3s ease !important;
-        position: relative !important;
-    }
-    
-    div[data-testid="column"]:nth-child(2) .stButton button:hover {
-        background: rgba(224, 118, 56, 0.08) !important;
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        color: #E07638 !important;
-        transform: translateY(-2px) !important;
-        box-shadow: 0 4px 16px rgba(224, 118, 56, 0.2) !important;
-    }
-    
-    div[data-testid="column"]:nth-child(2) .stButton {
-        position: relative !important;
-    }
-    
-    div[data-testid="column"]:nth-child(2) .stButton::before {
-        content: '';
-        position: absolute;
-        top: -4px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    div[data-testid="column"]:nth-child(2) .stButton::after {
-        content: '';
-        position: absolute;
-        top: -4px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    div[data-testid="column"]:nth-child(2) .stButton:hover::before,
-    div[data-testid="column"]:nth-child(2) .stButton:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    /* Canvas section */
-    .canvas-section {
-        max-width: 1400px;
-        margin: 50px auto;
-        padding: 0 20px;
-    }
-    
-    .canvas-title {
-        font-size: 1.5rem;
-        font-weight: 300;
-        color: #e5e7eb;
-        margin-bottom: 24px;
-        text-align: center;
-        letter-spacing: -0.01em;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-    }
-    
-    .canvas-container {
-        width: 100%;
-        max-width: 100%;
-        margin: 0 auto;
-        position: relative;
-    }
-    
-    .canvas-container svg {
-        width: 100%;
-        height: auto;
-        display: block;
-    }
-    
-    /* Radio buttons */
-    .stRadio > label {
-        color: #9ca3af !important;
-        font-weight: 400 !important;
-        font-size: 0.75rem !important;
-        margin-bottom: 12px !important;
-        text-transform: uppercase !important;
-        letter-spacing: 0.05em !important;
-    }
-    
-    .stRadio [role="radiogroup"] {
-        gap: 12px !important;
-        margin-bottom: 20px !important;
-    }
-    
-    .stRadio [role="radiogroup"] > div {
-        position: relative !important;
-    }
-    
-    .stRadio [role="radiogroup"] > div::before {
-        content: '';
-        position: absolute;
-        top: -4px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stRadio [role="radiogroup"] > div::after {
-        content: '';
-        position: absolute;
-        top: -4px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stRadio [role="radiogroup"] > div:hover::before,
-    .stRadio [role="radiogroup"] > div:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    .stRadio [role="radiogroup"] label {
-        background: rgba(40, 40, 40, 0.3) !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        border-radius: 0 !important;
-        padding: 10px 20px !important;
-        color: #9ca3af !important;
-        font-weight: 300 !important;
-        transition: all 0.3s ease !important;
-        cursor: pointer !important;
-        font-size: 0.9rem !important;
-    }
-    
-    .stRadio [role="radiogroup"] label:hover {
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        background: rgba(224, 118, 56, 0.05) !important;
-        color: #e5e7eb !important;
-    }
-    
-    .stRadio [role="radiogroup"] label div {
-        color: inherit !important;
-    }
-    
-    /* File uploader styling */
-    .stFileUploader {
-        margin-bottom: 20px;
-        position: relative !important;
-    }
-    
-    .stFileUploader::before {
-        content: '';
-        position: absolute;
-        top: -4px;
-        left: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stFileUploader::after {
-        content: '';
-        position: absolute;
-        top: -4px;
-        right: -4px;
-        width: 6px;
-        height: 6px;
-        background: rgba(224, 118, 56, 0.5);
-        z-index: 10;
-        pointer-events: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stFileUploader:hover::before,
-    .stFileUploader:hover::after {
-        background: #E07638;
-        width: 8px;
-        height: 8px;
-    }
-    
-    .stFileUploader section {
-        background-color: rgba(40, 40, 40, 0.3) !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        border-radius: 0 !important;
-        padding: 24px !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stFileUploader section:hover {
-        border-color: #E07638 !important;
-        border-width: 2px !important;
-        background: rgba(224, 118, 56, 0.05) !important;
-    }
-    
-    .stFileUploader label {
-        color: #9ca3af !important;
-        font-weight: 300 !important;
-        font-size: 0.875rem !important;
-    }
-    
-    .stFileUploader button {
-        background: rgba(60, 60, 60, 0.5) !important;
-        border: 1px solid rgba(255, 255, 255, 0.2) !important;
-        border-radius: 0 !important;
-        color: #e5e7eb !important;
-        font-weight: 400 !important;
-        padding: 8px 20px !important;
-    }
-    
-    .stFileUploader button:hover {
-        border-color: #E07638 !important;
-        color: #E07638 !important;
-    }
-    
-    /* Success messages */
-    .stSuccess {
-        background: rgba(224, 118, 56, 0.1) !important;
-        border: 1px solid rgba(224, 118, 56, 0.3) !important;
-        border-radius: 0 !important;
-        color: #E07638 !important;
-        font-weight: 400 !important;
-    }
-    
-    /* Info messages */
-    .stInfo {
-        background: rgba(100, 100, 100, 0.15) !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        border-radius: 0 !important;
-        color: #9ca3af !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+STATIC_DIR = Path(__file__).parent / "static"
+
+
+@st.cache_data(show_spinner=False)
+def load_css(filename: str = "app.css") -> str:
+    """Read a stylesheet from static/ once and minify it (drop comments, squash whitespace)."""
+    css = (STATIC_DIR / filename).read_text(encoding="utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.strip()
+
+
+@st.cache_data(show_spinner=False)
+def load_script(filename: str) -> str:
+    """Read a script from static/ once (kept as-is; JS isn't safe to regex-minify)."""
+    return (STATIC_DIR / filename).read_text(encoding="utf-8")
+
+
+# Streamlit drops any element that is not re-emitted during a rerun, so the
+# <style> block has to be sent every time; only the minified string is cached.
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 
 # -------------------------------
 # Helpers
 # -------------------------------
 @st.cache_resource(show_spinner=False)
-def get_gemini_client() -> GeminiClient:
-    """Create a single Gemini client using Streamlit secrets."""
+def get_gemini_client() -> "GeminiClient":
+    """
+    Create a single Gemini client using Streamlit secrets.
+
+    Don't pass the returned client into an st.cache_data function – fetch it
+    inside the cached body instead, so Streamlit never has to hash it.
+    """
+    from gemini_client import GeminiClient
+
     api_key = st.secrets.get("GEMINI_API_KEY")
     if not api_key:
         raise ValueError(
@@ -698,18 +86,324 @@ def get_gemini_client() -> GeminiClient:
     return GeminiClient(api_key=api_key, model_name="models/gemini-flash-latest")
 
 
-def build_combined_input(data_type: str, context: str, parsed_data: str) -> str:
-    """Combine meta info + parsed content into a single prompt string."""
-    return textwrap.dedent(
-        f"""
-        DATA TYPE: {data_type}
-        DESCRIPTION: {context or "Not provided"}
+@st.cache_data(show_spinner=False, max_entries=32)
+def _parse_cached(
+    text_input: str,
+    file_name: Optional[str],
+    file_hash: Optional[str],
+    _file_bytes: Optional[bytes],
+) -> str:
+    """
+    Cached wrapper around parse_input_data.
+
+    Keyed on the text and a digest of the file bytes, so reruns (context
+    edits, repeated Generate clicks) don't re-parse PDFs / spreadsheets.
+    The bytes themselves are underscore-prefixed so Streamlit doesn't
+    hash them a second time.
+    """
+    from data_parser import parse_input_data
+
+    return parse_input_data(
+        text_input=text_input,
+        file_name=file_name,
+        file_bytes=_file_bytes,
+    )
+
 
-        RAW DATA BELOW:
-        ----------------
-        {parsed_data}
-        """
-    ).strip()
+SPEC_MEMO_TTL = 3600  # seconds an in-memory spec stays fresh
+SPEC_MEMO_MAX_ENTRIES = 128
+
+
+@st.cache_resource(show_spinner=False)
+def _spec_memo() -> "tuple[threading.Lock, dict]":
+    """
+    Process-wide memo of generated specs: prompt → (stored at, spec).
+
+    This isn't st.cache_data on purpose: generation streams a preview into
+    a placeholder created outside the call, and st.cache_data would record
+    those element calls and fail replaying them on a cache hit.
+    """
+    return threading.Lock(), {}
+
+
+def _memoised_spec(combined_input: str) -> Optional[dict]:
+    """Return the in-memory spec for this prompt if it is still fresh."""
+    lock, memo = _spec_memo()
+    with lock:
+        hit = memo.get(combined_input)
+    if hit is not None and time.monotonic() - hit[0] < SPEC_MEMO_TTL:
+        return hit[1]
+    return None
+
+
+def _cached_visual_spec(
+    combined_input: str,
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """
+    Memoised wrapper around generate_visual_spec.
+
+    The Gemini client is fetched inside (it is already a cached resource),
+    so the memo key stays a plain prompt string.
+    """
+    from visual_spec_generator import generate_visual_spec
+
+    visual_spec = _memoised_spec(combined_input)
+    if visual_spec is not None:
+        return visual_spec
+
+    # Specs persisted by an earlier process survive restarts/redeploys.
+    visual_spec = disk_cache.get(combined_input)
+    if visual_spec is None:
+        visual_spec = generate_visual_spec(
+            input_data=combined_input,
+            gemini=get_gemini_client(),
+            on_chunk=on_chunk,
+        )
+
+        # Don't keep fallback specs produced from unparseable model output,
+        # on disk or in the memo: Generate again should retry Gemini.
+        if "_raw_model_text" in visual_spec:
+            return visual_spec
+        disk_cache.put(combined_input, visual_spec)
+
+    lock, memo = _spec_memo()
+    with lock:
+        memo.pop(combined_input, None)
+        if len(memo) >= SPEC_MEMO_MAX_ENTRIES:
+            # Evict the oldest entry (dicts keep insertion order)
+            memo.pop(next(iter(memo)))
+        memo[combined_input] = (time.monotonic(), visual_spec)
+
+    return visual_spec
+
+
+def _spec_key(spec: dict) -> str:
+    """Serialise a spec with sorted keys, for use as a cache key."""
+    if orjson is not None:
+        return orjson.dumps(spec, option=orjson.OPT_SORT_KEYS).decode()
+    # Compact separators give the same bytes as orjson, so a spec keeps its
+    # render seed (and postcard) whether or not orjson is installed
+    return json.dumps(spec, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _spec_pretty(spec: dict) -> str:
+    """Pretty-print a spec for the inspector."""
+    if orjson is not None:
+        return orjson.dumps(spec, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(spec, indent=2)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _render_cached(spec_json: str) -> str:
+    """
+    Cached wrapper around render_visual_spec.
+
+    Keyed on the spec serialised with sorted keys (dicts aren't a stable
+    cache key). The same string seeds the renderer's jitter, so a spec
+    draws the same postcard even after a cache eviction or restart.
+    """
+    from renderer import render_visual_spec
+
+    spec = orjson.loads(spec_json) if orjson is not None else json.loads(spec_json)
+    return render_visual_spec(spec, seed=spec_json)
+
+
+def _semantic_visual_spec(
+    combined_input: str,
+    data_type: str,
+    gemini: "GeminiClient",
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """
+    Look up a near-duplicate prompt in the per-session semantic cache
+    before falling back to the exact-match cached Gemini call.
+
+    There is one semantic cache per data type: the same upload under
+    another type embeds almost identically, but must get its own spec.
+    """
+    from semantic_cache import SemanticCache
+
+    sem_caches = st.session_state.setdefault("sem_caches", {})
+    sem_cache = sem_caches.setdefault(data_type, SemanticCache())
+
+    # An exact match in memory or on disk is local; don't make the embedding
+    # round-trip (which only decides whether Gemini is needed) for it. The
+    # memo comes first: it also covers specs a read-only disk couldn't keep.
+    visual_spec = _memoised_spec(combined_input)
+    if visual_spec is None:
+        visual_spec = disk_cache.get(combined_input)
+    if visual_spec is not None:
+        return visual_spec
+
+    try:
+        embedding = gemini.embed(combined_input)
+    except Exception:
+        # Embeddings are only an optimisation – never block generation on them.
+        embedding = None
+
+    if embedding is not None:
+        cached_spec = sem_cache.lookup(embedding)
+        if cached_spec is not None:
+            return cached_spec
+
+    visual_spec = _cached_visual_spec(combined_input, on_chunk=on_chunk)
+
+    # Don't remember fallback specs produced from unparseable model output.
+    if embedding is not None and "_raw_model_text" not in visual_spec:
+        sem_cache.add(embedding, visual_spec)
+
+    return visual_spec
+
+
+def _canvas_size(visual_spec: dict) -> "tuple[int, int]":
+    """Canvas width/height from a spec, with the renderer's 1200×800 default."""
+    canvas = visual_spec.get("canvas") or {}
+    try:
+        width = int(canvas.get("width", 1200))
+        height = int(canvas.get("height", 800))
+    except (TypeError, ValueError):
+        width, height = 1200, 800
+    if width <= 0 or height <= 0:
+        width, height = 1200, 800
+    return width, height
+
+
+def _frame_height(width: int, height: int) -> int:
+    """
+    Iframe height for a postcard: the canvas aspect ratio at the usual
+    ~1200px render width, plus the frame padding. Scrolling covers
+    narrower/wider layouts.
+    """
+    return int(1200 * height / width) + 80
+
+
+def _make_stream_preview(placeholder, min_interval: float = 0.15) -> Callable[[str], None]:
+    """
+    Build an on_chunk callback that previews a streaming spec.
+
+    Once complete elements have arrived they are rendered as a rough SVG
+    in the postcard's iframe; before that, the tail of the raw JSON is
+    shown. Redraws are throttled to one every min_interval seconds.
+    """
+    from streamlit.components.v1 import html as st_html
+
+    from renderer import render_visual_spec
+    from visual_spec_generator import parse_partial_spec
+
+    last_draw = 0.0
+
+    def _show_progress(buffer: str) -> None:
+        nonlocal last_draw
+        now = time.monotonic()
+        if now - last_draw < min_interval:
+            return
+        last_draw = now
+
+        partial_spec = parse_partial_spec(buffer)
+        if partial_spec["elements"]:
+            try:
+                preview = render_visual_spec(partial_spec)
+            except ValueError:
+                # Over the renderer's size limits; the final render reports it
+                preview = None
+            if preview is not None:
+                # Same isolated iframe as the final postcard, so the partial
+                # SVG never lands in (or gets diffed against) the main page
+                width, height = _canvas_size(partial_spec)
+                html = (
+                    f"<style>{load_css('visual_frame.css')}</style>"
+                    f'<div class="visual-frame"><div class="svg-wrap">{preview}</div></div>'
+                )
+                with placeholder.container():
+                    st_html(html, height=_frame_height(width, height), scrolling=True)
+                return
+        placeholder.code(buffer[-200:], language="json")
+
+    return _show_progress
+
+
+def _on_data_type_change() -> None:
+    """Drop the previous visual so it isn't shown under another data type."""
+    st.session_state.pop("last_spec", None)
+    st.session_state.pop("last_svg", None)
+    st.session_state.pop("last_svgz", None)
+    st.session_state.pop("last_spec_hash", None)
+    st.session_state.pop("_spec_pretty", None)
+
+
+def show_visual_journal(svg: str, svgz: bytes, visual_spec: dict) -> None:
+    """
+    Draw the SVG postcard, its download button and the spec inspector.
+
+    svgz is the gzip-compressed SVG, built once per generation and kept
+    in session state so reruns don't re-compress it for the download.
+    """
+    from streamlit.components.v1 import html as st_html
+
+    # Same canvas size the renderer used for the viewBox
+    width, height = _canvas_size(visual_spec)
+
+    # SVG keeps every mark as a DOM node; for dense postcards the Canvas mode
+    # rasterises the same SVG into one bitmap. Downloads stay SVG either way.
+    preview_mode = st.radio(
+        "Preview renderer",
+        ("SVG", "Canvas"),
+        horizontal=True,
+        key="preview_mode",
+    )
+    if preview_mode == "Canvas":
+        # "</" is escaped so the SVG can't close the JSON <script> early
+        svg_json = json.dumps(svg).replace("</", "<\\/")
+        body = (
+            f'<canvas id="preview-canvas" data-width="{width}" data-height="{height}"></canvas>'
+            f'<script type="application/json" id="svg-source">{svg_json}</script>'
+            f"<script>{load_script('canvas_preview.js')}</script>"
+        )
+    else:
+        body = svg
+
+    # The postcard gets its own iframe, so Streamlit swaps the srcdoc instead
+    # of diffing a large SVG against the main page on every rerun. The iframe
+    # doesn't see app.css, so it carries its own (cached) frame stylesheet.
+    html = (
+        f"<style>{load_css('visual_frame.css')}</style>"
+        '<div class="visual-frame">'
+        '<div class="corner tl"></div><div class="corner tr"></div>'
+        '<div class="corner bl"></div><div class="corner br"></div>'
+        f'<div class="svg-wrap">{body}</div>'
+        "</div>"
+    )
+
+    st_html(html, height=_frame_height(width, height), scrolling=True)
+
+    # Download buttons: plain SVG opens anywhere; the gzipped .svgz is much
+    # smaller but not every viewer/editor opens it from disk
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col2:
+        st.download_button(
+            label="⬇️ Download SVG postcard",
+            data=svg,
+            file_name="visual_journal.svg",
+            mime="image/svg+xml",
+            use_container_width=True
+        )
+    with col3:
+        st.download_button(
+            label="⬇️ Download SVGZ (compressed)",
+            data=svgz,
+            file_name="visual_journal.svgz",
+            mime="image/svg+xml",
+            use_container_width=True
+        )
+
+    # Debug / spec inspector – only serialise the spec when asked to, and
+    # only once per generation; later reruns reuse the pretty-printed string
+    with st.expander("🔍 View Technical Spec (JSON)"):
+        if st.checkbox("Show JSON", key="_show_json"):
+            if "_spec_pretty" not in st.session_state:
+                st.session_state["_spec_pretty"] = _spec_pretty(visual_spec)
+            st.code(st.session_state["_spec_pretty"], language="json")
 
 
 # -------------------------------
@@ -724,6 +418,22 @@ DATA_TYPES = {
     "Other / Mixed": "Custom visualization for any type of personal data or mixed content"
 }
 
+_CARD_TEMPLATE = (
+    '<div class="data-type-card {cls}">'
+    '<div class="card-title">{title}</div>'
+    '<div class="card-description">{desc}</div>'
+    '</div>'
+)
+
+# (unselected, selected) HTML for each card, so a rerun only picks strings
+CARD_HTML = {
+    data_type: tuple(
+        _CARD_TEMPLATE.format(cls=cls, title=data_type, desc=description)
+        for cls in ("", "selected")
+    )
+    for data_type, description in DATA_TYPES.items()
+}
+
 
 # -------------------------------
 # UI – Hero Section
@@ -766,36 +476,27 @@ st.markdown("""
 # -------------------------------
 # Data Type Selection Cards
 # -------------------------------
-st.markdown('<div class="data-type-grid">', unsafe_allow_html=True)
-
-# Initialize session state for selected data type
-if 'selected_data_type' not in st.session_state:
-    st.session_state.selected_data_type = None
-
-# Create columns for the grid layout
-cols = st.columns(3)
-for idx, (data_type, description) in enumerate(DATA_TYPES.items()):
-    with cols[idx % 3]:
-        selected_class = "selected" if st.session_state.selected_data_type == data_type else ""
-        
-        # Display card with description
-        st.markdown(f"""
-        <div class="data-type-card {selected_class}">
-            <div class="card-title">{data_type}</div>
-            <div class="card-description">{description}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Add clickable button below card
-        if st.button(
-            f"Select {data_type}",
-            key=f"btn_{data_type}",
-            use_container_width=True,
-        ):
-            st.session_state.selected_data_type = data_type
-            st.rerun()
+selected_data_type = st.session_state.get("selected_data_type")
 
-st.markdown('</div>', unsafe_allow_html=True)
+# Render all six cards as one HTML blob instead of a column + button per card.
+# They only describe the types (no hover affordance); the radio below selects.
+cards_html = "".join(
+    CARD_HTML[data_type][selected_data_type == data_type]
+    for data_type in DATA_TYPES
+)
+st.markdown(f'<div class="data-type-grid">{cards_html}</div>', unsafe_allow_html=True)
+
+# A single radio drives the selection (its value lives in session state).
+# Streamlit reruns once after the on_change callback – no st.rerun() needed.
+st.radio(
+    "Choose a data type",
+    list(DATA_TYPES),
+    index=None,
+    horizontal=True,
+    label_visibility="collapsed",
+    key="selected_data_type",
+    on_change=_on_data_type_change,
+)
 
 
 # Show input section only if a data type is selected
@@ -819,36 +520,39 @@ if st.session_state.selected_data_type:
     text_input = ""
     uploaded_file = None
     
-    if input_mode == "Type or paste text":
-        text_input = st.text_area(
-            "Your data",
-            height=200,
-            placeholder=f"Enter your {st.session_state.selected_data_type.lower()} data here...",
-            label_visibility="collapsed",
-            key="text_area_input"
-        )
-    else:
-        st.markdown('<p style="color: #9ca3af; font-size: 0.75rem; margin-bottom: 12px; text-transform: uppercase; letter-spacing: 0.05em;">Upload your data file</p>', unsafe_allow_html=True)
-        uploaded_file = st.file_uploader(
-            "Choose a file",
-            type=["txt", "pdf", "docx", "doc", "csv", "xlsx"],
+    # The form batches widget state: typing in the data / context fields no
+    # longer reruns the whole script, only pressing Generate does.
+    with st.form("gen_form", border=False):
+        if input_mode == "Type or paste text":
+            text_input = st.text_area(
+                "Your data",
+                height=200,
+                placeholder=f"Enter your {st.session_state.selected_data_type.lower()} data here...",
+                label_visibility="collapsed",
+                key="text_area_input"
+            )
+        else:
+            st.markdown('<p style="color: #9ca3af; font-size: 0.75rem; margin-bottom: 12px; text-transform: uppercase; letter-spacing: 0.05em;">Upload your data file</p>', unsafe_allow_html=True)
+            uploaded_file = st.file_uploader(
+                "Choose a file",
+                type=["txt", "pdf", "docx", "doc", "csv", "xlsx"],
+                label_visibility="collapsed",
+                key="file_uploader_input"
+            )
+            
+            if uploaded_file:
+                st.success(f"✓ File uploaded: {uploaded_file.name}")
+        
+        context = st.text_input(
+            "Add context (optional)",
+            placeholder="e.g., 'One week of my sleep patterns' or 'My morning routine in winter'",
             label_visibility="collapsed",
-            key="file_uploader_input"
+            key="context_input"
         )
         
-        if uploaded_file:
-            st.success(f"✓ File uploaded: {uploaded_file.name}")
-    
-    context = st.text_input(
-        "Add context (optional)",
-        placeholder="e.g., 'One week of my sleep patterns' or 'My morning routine in winter'",
-        label_visibility="collapsed",
-        key="context_input"
-    )
-    
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        generate_button = st.button("✨ Generate Visualization", type="primary", use_container_width=True, key="generate_btn")
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            generate_button = st.form_submit_button("✨ Generate Visualization", type="primary", use_container_width=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -858,10 +562,21 @@ if st.session_state.selected_data_type:
     st.markdown('<div class="canvas-section">', unsafe_allow_html=True)
     st.markdown('<h2 class="canvas-title">Your Visual Journal</h2>', unsafe_allow_html=True)
     
-    visual_container = st.container()
-    
-    if not generate_button:
-        with visual_container:
+    # A single st.empty() slot: each run fills it through one .container(),
+    # so the postcard, placeholder text or errors replace each other in place
+    # rather than stacking up as new elements.
+    visual_slot = st.empty()
+    
+    if not generate_button and st.session_state.get("last_svg"):
+        # Redraw the last result instead of dropping it on unrelated reruns
+        with visual_slot.container():
+            show_visual_journal(
+                st.session_state["last_svg"],
+                st.session_state["last_svgz"],
+                st.session_state["last_spec"],
+            )
+    elif not generate_button:
+        with visual_slot.container():
             st.info(
                 "Your visualization will appear here once generated. "
                 f"Add your {st.session_state.selected_data_type.lower()} data above to begin."
@@ -870,29 +585,43 @@ if st.session_state.selected_data_type:
         if not text_input and not uploaded_file:
             st.warning("Please either type/paste some text or upload a file.")
         else:
-            try:
-                gemini = get_gemini_client()
-            except Exception as e:
-                with visual_container:
-                    st.error("Could not initialize Gemini client.")
-                    st.code(str(e))
-            else:
-                with visual_container:
-                    with st.spinner("Creating your visual journal..."):
-                        try:
-                            # 1. Parse raw input into text
-                            parsed_data = parse_input_data(
-                                text_input=text_input,
-                                uploaded_file=uploaded_file,
-                            )
-
-                            if not parsed_data.strip():
-                                st.error(
-                                    "I couldn't extract any readable text from your input. "
-                                    "Try typing some text or using a simpler file."
+            with visual_slot.container():
+                with st.spinner("Creating your visual journal..."):
+                    try:
+                        # 1. Parse raw input into text. Importing the Gemini SDK
+                        #    (the slow part of a cold client) doesn't need it, so
+                        #    that runs on a worker thread in the meantime.
+                        with ThreadPoolExecutor(max_workers=1) as pool:
+                            pool.submit(importlib.import_module, "gemini_client")
+                            if uploaded_file is None:
+                                # Text-only path: nothing to parse, so skip the
+                                # parser module and its cache altogether.
+                                parsed_data = text_input.strip()
+                            else:
+                                # Read and hash the upload once; the digest is the cache key.
+                                file_bytes = uploaded_file.getvalue()
+                                parsed_data = _parse_cached(
+                                    text_input=text_input,
+                                    file_name=uploaded_file.name,
+                                    file_hash=hashlib.blake2b(file_bytes, digest_size=16).hexdigest(),
+                                    _file_bytes=file_bytes,
                                 )
+
+                        if not parsed_data.strip():
+                            st.error(
+                                "I couldn't extract any readable text from your input. "
+                                "Try typing some text or using a simpler file."
+                            )
+                        else:
+                            try:
+                                gemini = get_gemini_client()
+                            except Exception as e:
+                                st.error("Could not initialize Gemini client.")
+                                st.code(str(e))
                             else:
                                 # 2. Build combined input for model
+                                from visual_spec_generator import build_combined_input
+
                                 combined_input = build_combined_input(
                                     data_type=st.session_state.selected_data_type,
                                     context=context,
@@ -900,77 +629,63 @@ if st.session_state.selected_data_type:
                                 )
 
                                 # 3. Ask Gemini to design a visual spec (JSON-like)
-                                visual_spec = generate_visual_spec(
-                                    input_data=combined_input,
-                                    gemini=gemini,
+                                #    Stream the response into a placeholder so the user
+                                #    sees a rough preview before the JSON is complete.
+                                stream_placeholder = st.empty()
+                                visual_spec = _semantic_visual_spec(
+                                    combined_input,
+                                    st.session_state.selected_data_type,
+                                    gemini,
+                                    on_chunk=_make_stream_preview(stream_placeholder),
                                 )
-
-                                # visual_spec might be dict or JSON string
-                                if isinstance(visual_spec, str):
-                                    try:
-                                        visual_spec = json.loads(visual_spec)
-                                    except json.JSONDecodeError:
-                                        st.error(
-                                            "Gemini returned text that is not valid JSON. "
-                                            "Check the debug panel below."
-                                        )
-                                        with st.expander("Debug: Raw response from Gemini"):
-                                            st.text(visual_spec)
-                                        visual_spec = {}
-
-                                if not isinstance(visual_spec, dict):
-                                    st.error("Visual spec is not a valid JSON object.")
+                                stream_placeholder.empty()
+
+                                # generate_visual_spec always returns a dict; when
+                                # the model output couldn't be parsed it's a fallback
+                                # spec carrying the raw text for debugging.
+                                raw_model_text = visual_spec.get("_raw_model_text")
+                                if raw_model_text:
+                                    st.error(
+                                        "Gemini returned text that is not valid JSON. "
+                                        "Check the debug panel below."
+                                    )
+                                    with st.expander("Debug: Raw response from Gemini"):
+                                        st.text(raw_model_text)
+
+                                # 4. Render spec → SVG. Generating the same spec
+                                #    again (e.g. a cache hit) reuses the last SVG
+                                #    and its .svgz instead of rendering/compressing.
+                                spec_key = _spec_key(visual_spec)
+                                spec_hash = hashlib.blake2b(
+                                    spec_key.encode("utf-8"), digest_size=16
+                                ).hexdigest()
+                                if (
+                                    spec_hash == st.session_state.get("last_spec_hash")
+                                    and st.session_state.get("last_svg")
+                                ):
+                                    svg = st.session_state["last_svg"]
+                                    svgz = st.session_state["last_svgz"]
                                 else:
-                                    # 4. Render spec → SVG
-                                    svg = render_visual_spec(visual_spec)
-
-                                    # 5. Responsive, centered SVG container with external corners
-                                    html = f"""
-                                    <div style="
-                                        border: 1px solid rgba(255, 255, 255, 0.15);
-                                        padding: 32px;
-                                        background: rgba(40, 40, 40, 0.3);
-                                        border-radius: 0;
-                                        width: 100%;
-                                        max-width: 100%;
-                                        margin: 0 auto 2rem auto;
-                                        overflow: hidden;
-                                        box-shadow: 0 4px 16px rgba(0, 0, 0, 0.2);
-                                        position: relative;
-                                    ">
-                                        <div style="position: absolute; top: -4px; left: -4px; width: 8px; height: 8px; background: #E07638;"></div>
-                                        <div style="position: absolute; top: -4px; right: -4px; width: 8px; height: 8px; background: #E07638;"></div>
-                                        <div style="position: absolute; bottom: -4px; left: -4px; width: 8px; height: 8px; background: #E07638;"></div>
-                                        <div style="position: absolute; bottom: -4px; right: -4px; width: 8px; height: 8px; background: #E07638;"></div>
-                                        <div style="width: 100%; max-width: 100%; overflow-x: auto;">
-                                            {svg}
-                                        </div>
-                                    </div>
-                                    """
-                                    st.markdown(html, unsafe_allow_html=True)
-
-                                    # 6. Download button
-                                    col1, col2, col3 = st.columns([1, 2, 1])
-                                    with col2:
-                                        st.download_button(
-                                            label="⬇️ Download SVG",
-                                            data=svg,
-                                            file_name="visual_journal.svg",
-                                            mime="image/svg+xml",
-                                            use_container_width=True
-                                        )
-
-                                    # 7. Debug / spec inspector
-                                    with st.expander("🔍 View Technical Spec (JSON)"):
-                                        st.code(
-                                            json.dumps(visual_spec, indent=2),
-                                            language="json",
-                                        )
-
-                        except Exception as e:
-                            st.error("Something went wrong while generating the visual.")
-                            with st.expander("Error details"):
-                                st.exception(e)
+                                    svg = _render_cached(spec_key)
+                                    svgz = gzip.compress(svg.encode("utf-8"), compresslevel=6)
+                                    st.session_state.pop("_spec_pretty", None)
+
+                                # 5. Remember the result so reruns (download,
+                                #    expander, other widgets) can redraw it
+                                st.session_state.update(
+                                    last_spec=visual_spec,
+                                    last_spec_hash=spec_hash,
+                                    last_svg=svg,
+                                    last_svgz=svgz,
+                                )
+
+                                # 6. Show the postcard, download + spec inspector
+                                show_visual_journal(svg, svgz, visual_spec)
+
+                    except Exception as e:
+                        st.error("Something went wrong while generating the visual.")
+                        with st.expander("Error details"):
+                            st.exception(e)
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -11,17 +11,30 @@ so that missing libraries don't crash the whole app on import.
 from typing import Optional
 from io import BytesIO
 
+# Tables are cut to this many rows: the prompt is capped at ~32k characters
+# anyway, so parsing a 500 MB sheet in full would only be thrown away.
+MAX_TABLE_ROWS = 1000
+
+# Text kept from PDFs; matches the ~32k character prompt cap applied in
+# visual_spec_generator.build_combined_input.
+MAX_PDF_CHARS = 32000
+
 
 def parse_input_data(
     text_input: Optional[str] = "",
-    uploaded_file: Optional[BytesIO] = None,
+    file_name: Optional[str] = None,
+    file_bytes: Optional[bytes] = None,
 ) -> str:
     """
     Return a plain-text version of the user's input.
 
+    The uploaded file is passed as (name, bytes) rather than a file-like
+    object: the bytes are read once by the caller, are hashable for
+    st.cache_data, and need no seek(0) bookkeeping between readers.
+
     Priority:
     1. If text_input is non-empty -> use that.
-    2. Else, if uploaded_file is provided -> extract based on extension.
+    2. Else, if file_bytes is provided -> extract based on file_name's extension.
     """
 
     # 1. If user typed/pasted text, just use it.
@@ -29,29 +42,29 @@ def parse_input_data(
         return text_input.strip()
 
     # 2. If a file is uploaded, handle based on extension.
-    if uploaded_file is None:
+    if file_bytes is None:
         return ""
 
-    filename = (uploaded_file.name or "").lower()
+    filename = (file_name or "").lower()
 
     if filename.endswith(".txt"):
-        return _read_txt(uploaded_file)
+        return _read_txt(file_bytes)
 
     if filename.endswith(".pdf"):
-        return _read_pdf(uploaded_file)
+        return _read_pdf(file_bytes)
 
     if filename.endswith((".docx", ".doc")):
-        return _read_docx(uploaded_file)
+        return _read_docx(file_bytes)
 
     if filename.endswith(".csv"):
-        return _read_csv(uploaded_file)
+        return _read_csv(file_bytes)
 
     if filename.endswith((".xlsx", ".xlsm", ".xls")):
-        return _read_xlsx(uploaded_file)
+        return _read_xlsx(file_bytes)
 
     # Fallback: just try to decode as text
     try:
-        return uploaded_file.read().decode("utf-8", errors="ignore")
+        return file_bytes.decode("utf-8", errors="ignore")
     except Exception:
         return ""
 
@@ -61,40 +74,62 @@ def parse_input_data(
 # -------------------------
 
 
-def _read_txt(file_obj: BytesIO) -> str:
-    try:
-        content = file_obj.read().decode("utf-8", errors="ignore")
-        return content.strip()
-    finally:
-        file_obj.seek(0)
+def _read_txt(data: bytes) -> str:
+    return data.decode("utf-8", errors="ignore").strip()
 
 
-def _read_pdf(file_obj: BytesIO) -> str:
+def _read_pdf(data: bytes) -> str:
     """
-    Lightweight PDF text extractor using PyPDF2.
-    If PyPDF2 is not installed, return an empty string instead of crashing.
+    Lightweight PDF text extractor using pypdf (or its predecessor PyPDF2).
+    If neither is installed, return an empty string instead of crashing.
+
+    Page text extraction is the slow part, and only about MAX_PDF_CHARS of
+    text (head and tail) is ever sent on, so pages are read from the front
+    and from the back until each half is filled and the middle is skipped.
     """
     try:
-        import PyPDF2  # type: ignore
+        import pypdf as pdf_lib  # type: ignore
     except ImportError:
-        return ""
+        try:
+            import PyPDF2 as pdf_lib  # type: ignore
+        except ImportError:
+            return ""
 
-    text_chunks = []
-    try:
-        reader = PyPDF2.PdfReader(file_obj)
-        for page in reader.pages:
-            try:
-                page_text = page.extract_text() or ""
-                text_chunks.append(page_text)
-            except Exception:
-                continue
-    finally:
-        file_obj.seek(0)
+    reader = pdf_lib.PdfReader(BytesIO(data))
+    pages = reader.pages
+    half = MAX_PDF_CHARS // 2
+
+    def page_text(index: int) -> str:
+        try:
+            return pages[index].extract_text() or ""
+        except Exception:
+            return ""
+
+    head_chunks, head_len = [], 0
+    front = 0
+    while front < len(pages) and head_len < half:
+        text = page_text(front)
+        head_chunks.append(text)
+        head_len += len(text)
+        front += 1
+
+    tail_chunks, tail_len = [], 0
+    back = len(pages) - 1
+    while back >= front and tail_len < half:
+        text = page_text(back)
+        tail_chunks.append(text)
+        tail_len += len(text)
+        back -= 1
+
+    text_chunks = head_chunks
+    if back >= front:
+        text_chunks.append(f"[{back - front + 1} pages omitted]")
+    text_chunks.extend(reversed(tail_chunks))
 
     return "\n".join(text_chunks).strip()
 
 
-def _read_docx(file_obj: BytesIO) -> str:
+def _read_docx(data: bytes) -> str:
     """
     DOCX text extractor using python-docx.
     If python-docx is not installed, return empty string.
@@ -104,15 +139,12 @@ def _read_docx(file_obj: BytesIO) -> str:
     except ImportError:
         return ""
 
-    try:
-        document = docx.Document(file_obj)
-        paragraphs = [p.text for p in document.paragraphs if p.text]
-        return "\n".join(paragraphs).strip()
-    finally:
-        file_obj.seek(0)
+    document = docx.Document(BytesIO(data))
+    paragraphs = [p.text for p in document.paragraphs if p.text]
+    return "\n".join(paragraphs).strip()
 
 
-def _read_csv(file_obj: BytesIO) -> str:
+def _read_csv(data: bytes) -> str:
     """
     Convert CSV into a readable text summary using pandas.
     If pandas is not installed, return raw decoded text.
@@ -120,20 +152,25 @@ def _read_csv(file_obj: BytesIO) -> str:
     try:
         import pandas as pd  # type: ignore
     except ImportError:
-        try:
-            content = file_obj.read().decode("utf-8", errors="ignore")
-            return content.strip()
-        finally:
-            file_obj.seek(0)
+        return data.decode("utf-8", errors="ignore").strip()
 
-    try:
-        df = pd.read_csv(file_obj)
-        return df.to_csv(index=False)
-    finally:
-        file_obj.seek(0)
+    # Counting newlines is a single C-speed scan; quoted multi-line cells
+    # can inflate it, so it's only used as an approximate row count. The
+    # header line isn't a row, and the last line may lack a newline.
+    approx_rows = data.count(b"\n") + (not data.endswith(b"\n")) - 1
+
+    # Whatever the file's size, at most MAX_TABLE_ROWS rows are parsed, so
+    # pandas' default parser (the only engine that honours nrows) is used.
+    df = pd.read_csv(BytesIO(data), nrows=MAX_TABLE_ROWS)
+    if approx_rows > MAX_TABLE_ROWS:
+        return (
+            df.to_csv(index=False)
+            + f"\n[showing the first {len(df)} of ~{approx_rows} rows]"
+        )
+    return df.to_csv(index=False)
 
 
-def _read_xlsx(file_obj: BytesIO) -> str:
+def _read_xlsx(data: bytes) -> str:
     """
     Convert Excel into a readable text summary using pandas.
     If pandas/openpyxl are not installed, return empty string.
@@ -143,13 +180,18 @@ def _read_xlsx(file_obj: BytesIO) -> str:
     except ImportError:
         return ""
 
+    # read all sheets and join; calamine (Rust) is much faster than openpyxl
+    # and also reads legacy .xls, but it's optional
     try:
-        # read all sheets and join
-        excel = pd.read_excel(file_obj, sheet_name=None)
-        parts = []
-        for name, df in excel.items():
-            parts.append(f"Sheet: {name}")
-            parts.append(df.to_csv(index=False))
-        return "\n\n".join(parts).strip()
-    finally:
-        file_obj.seek(0)
+        excel = pd.read_excel(
+            BytesIO(data), sheet_name=None, nrows=MAX_TABLE_ROWS, engine="calamine"
+        )
+    except Exception:
+        excel = pd.read_excel(BytesIO(data), sheet_name=None, nrows=MAX_TABLE_ROWS)
+    parts = []
+    for name, df in excel.items():
+        parts.append(f"Sheet: {name}")
+        parts.append(df.to_csv(index=False))
+        if len(df) == MAX_TABLE_ROWS:
+            parts.append(f"[showing the first {MAX_TABLE_ROWS} rows]")
+    return "\n\n".join(parts).strip()
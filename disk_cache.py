@@ -0,0 +1,69 @@
+# disk_cache.py
+
+"""
+A tiny JSON-on-disk cache for Gemini visual specs.
+
+The in-memory spec memo in app.py disappears on every restart/redeploy.
+Specs are small JSON dicts, so we also keep one file per prompt under
+~/.datadoodler_cache/<sha256 of prompt>.json.
+
+All failures (unreadable files, read-only disk) are swallowed: the cache
+is only an optimisation and must never break generation.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+CACHE_DIR = Path.home() / ".datadoodler_cache"
+
+
+def _path_for(key: str) -> Path:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{digest}.json"
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """Return the cached spec for this prompt, or None on a miss."""
+    path = _path_for(key)
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            spec = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    return spec if isinstance(spec, dict) else None
+
+
+def put(key: str, spec: Dict[str, Any]) -> None:
+    """Store a spec for this prompt (written atomically via a temp file)."""
+    path = _path_for(key)
+    tmp_name = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        os.replace(tmp_name, path)
+    except (OSError, TypeError, ValueError):
+        # clear() only removes *.json, so don't leave a half-written temp file
+        if tmp_name is not None:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+
+def clear() -> None:
+    """Remove every cached spec."""
+    if not CACHE_DIR.exists():
+        return
+    for path in CACHE_DIR.glob("*.json"):
+        try:
+            path.unlink()
+        except OSError:
+            continue
@@ -1,10 +1,59 @@
 # gemini_client.py
 
 import os
-from typing import Optional
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 import google.generativeai as genai
 
 
+# genai.configure() sets process-wide state, and a GenerativeModel is fixed
+# to one system instruction, so both are shared at module level: every
+# session (and every GeminiClient) in the process reuses them.
+_LOCK = threading.Lock()
+_CONFIGURED_KEY: Optional[str] = None
+_MODELS: Dict[Tuple[str, str, bool], "genai.GenerativeModel"] = {}
+_MAX_MODELS = 8  # main + repair prompts, with room for edited system prompts
+
+
+def _configure(api_key: str) -> None:
+    """Call genai.configure() only when the API key actually changes."""
+    global _CONFIGURED_KEY
+    with _LOCK:
+        if _CONFIGURED_KEY != api_key:
+            genai.configure(api_key=api_key)
+            _CONFIGURED_KEY = api_key
+            _MODELS.clear()
+
+
+def _get_model(
+    model_name: str,
+    system_instruction: str,
+    json_output: bool,
+) -> "genai.GenerativeModel":
+    """Return the shared model handle for this name/instruction/output mode."""
+    key = (model_name, system_instruction, json_output)
+    with _LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            generation_config = None
+            if json_output:
+                generation_config = {"response_mime_type": "application/json"}
+
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                system_instruction=system_instruction,
+                generation_config=generation_config,
+            )
+            if len(_MODELS) >= _MAX_MODELS:
+                # Evict the least recently used handle (dicts keep order)
+                _MODELS.pop(next(iter(_MODELS)))
+        else:
+            # Move to the end so the order stays least → most recently used
+            del _MODELS[key]
+        _MODELS[key] = model
+        return model
+
+
 class GeminiClient:
     """
     Wrapper around Google Gemini Flash for Data Humanism visual generation.
@@ -17,34 +66,88 @@ class GeminiClient:
     def __init__(
         self,
         api_key: Optional[str] = None,
-        model_name: str = "models/gemini-flash-latest"
+        model_name: str = "models/gemini-flash-latest",
+        embedding_model: str = "models/text-embedding-004",
     ):
         # Load API key
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY is missing. Add it in Streamlit secrets.")
 
-        # Configure client
-        genai.configure(api_key=self.api_key)
+        # Configure client (once per process and key)
+        _configure(self.api_key)
         self.model_name = model_name
+        self.embedding_model = embedding_model
+
+    def _build_model(
+        self,
+        system_instruction: str,
+        json_output: bool = False,
+    ) -> genai.GenerativeModel:
+        """
+        System instructions must be set at model creation time, so models
+        are shared per instruction rather than rebuilt on every call.
+        With json_output=True, Gemini is constrained to emit a JSON document.
+        """
+        return _get_model(self.model_name, system_instruction, json_output)
 
-    def generate(self, system_instruction: str, user_content: str) -> str:
+    def generate(
+        self,
+        system_instruction: str,
+        user_content: str,
+        on_chunk: Optional[Callable[[str], None]] = None,
+        json_output: bool = False,
+    ) -> str:
         """
         Ask Gemini to generate text based on a system instruction and user content.
         Returns the model's raw text output.
+
+        If on_chunk is given, the response is streamed and on_chunk is called
+        with the text received so far after every chunk. This stays on the
+        sync API: the SDK caches its async gRPC client per process, and that
+        client is bound to the event loop it was first used on.
         """
+        model = self._build_model(system_instruction, json_output)
 
-        # System instructions must be set at model creation time
-        model = genai.GenerativeModel(
-            model_name=self.model_name,
-            system_instruction=system_instruction
-        )
+        if on_chunk is None:
+            # Only the user content goes here
+            response = model.generate_content(user_content)
+
+            # Validate output
+            if not hasattr(response, "text") or response.text is None:
+                raise RuntimeError("Gemini did not return a valid .text output.")
+
+            return response.text
+
+        response = model.generate_content(user_content, stream=True)
 
-        # Only the user content goes here
-        response = model.generate_content(user_content)
+        buffer = ""
+        for chunk in response:
+            try:
+                chunk_text = chunk.text or ""
+            except ValueError:
+                # Chunks without text parts (e.g. finish metadata) are skipped
+                continue
+            buffer += chunk_text
+            on_chunk(buffer)
 
-        # Validate output
-        if not hasattr(response, "text") or response.text is None:
+        if not buffer:
             raise RuntimeError("Gemini did not return a valid .text output.")
 
-        return response.text
+        return buffer
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Return an embedding vector for the given text.
+        Used by the semantic cache to spot near-duplicate prompts.
+        """
+        result = genai.embed_content(
+            model=self.embedding_model,
+            content=text,
+            task_type="semantic_similarity",
+        )
+        embedding = result.get("embedding") if isinstance(result, dict) else None
+        if not embedding:
+            raise RuntimeError("Gemini did not return a valid embedding.")
+
+        return list(embedding)
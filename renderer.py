@@ -1,23 +1,81 @@
+from functools import lru_cache
 from typing import Dict, Any, List
 import random
+import re
 
 LEGEND_RESERVED_HEIGHT = 160
 CONTENT_TOP_MARGIN = 90  
 
+# Upper bounds on what a spec may ask for, so a runaway model response fails
+# fast instead of building an enormous SVG string.
+MAX_ELEMENTS = 50_000
+MAX_LEGEND_ITEMS = 200
+MAX_POLYGON_POINTS = 10_000
+
 BACKGROUND_COLORS = {
     "calm": "#F7F3EB",  
     "intense": "#FBEDE4",  
     "sad": "#F3F5FA"  
 }
 
+# Per-element markup as %-templates: one format call per element instead of
+# an f-string with a separate __format__ dispatch per field. Numbers are
+# written short at the source (%.2f coordinates and opacities, %g sizes)
+# instead of as 17-digit float reprs.
+PATH_TPL = '<path d="%s" fill="%s" stroke="%s" stroke-width="%g" opacity="%.2f" />'
+TEXT_TPL = (
+    '<text x="%.2f" y="%.2f" text-anchor="%s" '
+    'font-family="Dancing Script, cursive" font-size="%g" '
+    'fill="%s" opacity="%.2f">%s</text>'
+)
+LEGEND_CIRCLE_TPL = '<circle cx="%s" cy="%s" r="5" fill="%s" stroke="#222" stroke-width="0.7" />'
+LEGEND_TRIANGLE_TPL = (
+    '<polygon points="%s,%s %s,%s %s,%s" '
+    'fill="%s" stroke="#222" stroke-width="0.7" />'
+)
+LEGEND_LABEL_TPL = (
+    '<text x="%s" y="%s" font-family="Dancing Script, cursive" '
+    'font-size="13" fill="#222">%s</text>'
+)
+GROUP_OPEN_TPL = '<g fill="%s" stroke="%s" stroke-width="%g">'
+GROUP_PATH_TPL = '<path d="%s" opacity="%.2f" />'
+TITLE_TPL = (
+    '<text x="%g" y="50" text-anchor="middle" '
+    'font-family="Dancing Script, cursive" font-size="24" fill="#222">%s</text>'
+)
+
+# Mark geometry, with two-decimal coordinates
+CIRCLE_D_TPL = "M%.2f,%.2f a%.2f,%.2f 0 1,0 %.2f,0 a%.2f,%.2f 0 1,0 %.2f,0"
+WOBBLE_D_TPL = "M%.2f,%.2f Q%.2f,%.2f %.2f,%.2f"
+POINT_TPL = "%.2f,%.2f"
+
+# Jitter draws come from a random.Random instance per render, passed down as
+# its bound random() method ("rand"): a C call, ~40% cheaper per draw than
+# random.uniform(), and seedable so a spec can always draw the same postcard.
+
+@lru_cache(maxsize=64)
+def _svg_prelude(width: int, height: int, background: str) -> str:
+    # Nearly every postcard shares a canvas size and background
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" '
+        f'viewBox="0 0 {width} {height}" '
+        f'preserveAspectRatio="xMidYMid meet" '
+        f'style="max-width:100%; height:auto; display:block; margin:0 auto;">'
+        f'<rect x="0" y="0" width="{width}" height="{height}" fill="{background}" />'
+    )
+
 def _get_num(value: Any, default: float = 0.0) -> float:
+    # Missing attributes (None) are common; raising and catching TypeError
+    # for them costs ~25x more than this check.
+    if value is None:
+        return default
     try:
         return float(value)
     except (TypeError, ValueError):
         return default
 
-def _jitter(value: float, amount: float = 1.6) -> float:
-    return value + random.uniform(-amount, amount)
+def _jitter(value: float, rand, amount: float = 1.6) -> float:
+    return value + (rand() * 2.0 - 1.0) * amount
 
 def _clamp_y(y: float, height: int) -> float:
     content_bottom = height - LEGEND_RESERVED_HEIGHT - 20
@@ -32,15 +90,52 @@ def _wobble_path(
     y1: float,
     x2: float,
     y2: float,
+    rand,
     wobble_strength: float = 3.0,
 ) -> str:
-    cx = (x1 + x2) / 2.0 + random.uniform(-wobble_strength, wobble_strength)
-    cy = (y1 + y2) / 2.0 + random.uniform(-wobble_strength, wobble_strength)
-    return f"M{x1},{y1} Q{cx},{cy} {x2},{y2}"
+    cx = (x1 + x2) / 2.0 + (rand() * 2.0 - 1.0) * wobble_strength
+    cy = (y1 + y2) / 2.0 + (rand() * 2.0 - 1.0) * wobble_strength
+    return WOBBLE_D_TPL % (x1, y1, cx, cy, x2, y2)
+
+def _polygon_points(pts: List[Any], tx, ty, height: int, rand) -> List[str]:
+    # Hot loop for dense polygons: names are bound locally and the common
+    # all-numeric point skips the _get_num/_jitter/_clamp_y call layers.
+    top = CONTENT_TOP_MARGIN
+    bottom = height - LEGEND_RESERVED_HEIGHT - 20
+    out = []
+    append = out.append
+    for p in pts:
+        if not isinstance(p, (list, tuple)) or len(p) < 2:
+            continue
+        try:
+            px_raw = float(p[0])
+            py_raw = float(p[1])
+        except (TypeError, ValueError):
+            px_raw = _get_num(p[0])
+            py_raw = _get_num(p[1])
+        px = tx(px_raw) + rand() * 3.6 - 1.8
+        py = ty(py_raw) + rand() * 3.6 - 1.8
+        if py < top:
+            py = top
+        elif py > bottom:
+            py = bottom
+        append(POINT_TPL % (px, py))
+    return out
 
 def _escape(text: str) -> str:
+    text = text or ""
+    # Most labels and path data need no escaping; membership tests are far
+    # cheaper than five replace() passes (or a str.translate with a table).
+    if (
+        "&" not in text
+        and "<" not in text
+        and ">" not in text
+        and '"' not in text
+        and "'" not in text
+    ):
+        return text
     return (
-        (text or "")
+        text
         .replace("&", "&amp;")
         .replace("<", "&lt;")
         .replace(">", "&gt;")
@@ -48,11 +143,21 @@ def _escape(text: str) -> str:
         .replace("'", "&apos;")
     )
 
+_LONG_FLOAT_RE = re.compile(r"-?\d+\.\d{3,}")
+
+def _round_float(match: "re.Match[str]") -> str:
+    text = f"{float(match.group()):.2f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
 def _compute_bbox(elements: List[Dict[str, Any]], width: int, height: int):
     min_x, max_x, min_y, max_y = None, None, None, None
 
     for el in elements:
-        el_type = (el.get("type") or "").lower()
+        el_type = el.get("type")
+        # Same rule as the render loop: non-string types are skipped
+        if not isinstance(el_type, str):
+            continue
+        el_type = el_type.lower()
 
         if el_type == "circle":
             x = _get_num(el.get("x"), width / 2)
@@ -104,7 +209,82 @@ def _compute_bbox(elements: List[Dict[str, Any]], width: int, height: int):
 
     return min_x, min_y, max_x, max_y
 
-def render_visual_spec(spec: Dict[str, Any]) -> str:
+# Element handlers. Each returns (style, d) for a mark that may be merged
+# into a same-style <path> run, (None, markup) for a standalone element, or
+# None when there's nothing to draw. Random draws keep the original order.
+def _render_circle(el, style, tx, ty, scale, width, height, rand):
+    cx_raw = _get_num(el.get("x"), width / 2)
+    cy_raw = _get_num(el.get("y"), height / 2)
+    r_raw = _get_num(el.get("radius"), 8)
+
+    cx = _jitter(tx(cx_raw), rand, amount=2.3)
+    cy = _clamp_y(_jitter(ty(cy_raw), rand, amount=2.3), height)
+    r = max(_jitter(r_raw * scale, rand, amount=1.0), 0.8)
+
+    return style, CIRCLE_D_TPL % (cx - r, cy, r, r, 2 * r, r, r, -2 * r)
+
+def _render_line(el, style, tx, ty, scale, width, height, rand):
+    x1_raw = _get_num(el.get("x"), width / 2)
+    y1_raw = _get_num(el.get("y"), height / 2)
+    x2_raw = _get_num(el.get("x2"), x1_raw + 10)
+    y2_raw = _get_num(el.get("y2"), y1_raw)
+
+    x1 = _jitter(tx(x1_raw), rand, amount=2.0)
+    y1 = _clamp_y(_jitter(ty(y1_raw), rand, amount=2.0), height)
+    x2 = _jitter(tx(x2_raw), rand, amount=2.0)
+    y2 = _clamp_y(_jitter(ty(y2_raw), rand, amount=2.0), height)
+
+    # Lines are never filled
+    d = _wobble_path(x1, y1, x2, y2, rand, wobble_strength=3.0)
+    return ("none",) + style[1:], d
+
+def _render_polygon(el, style, tx, ty, scale, width, height, rand):
+    pts = el.get("points") or []
+    if not isinstance(pts, list) or not pts:
+        return None
+    if len(pts) > MAX_POLYGON_POINTS:
+        raise ValueError(
+            f"Polygon has {len(pts)} points; the limit is {MAX_POLYGON_POINTS}."
+        )
+    jittered_points = _polygon_points(pts, tx, ty, height, rand)
+    if not jittered_points:
+        return None
+    return style, f"M{' L'.join(jittered_points)} Z"
+
+def _render_path(el, style, tx, ty, scale, width, height, rand):
+    d_raw = el.get("d") or ""
+    if not d_raw:
+        return None
+    # User paths may start with a relative "m", so never merge them. Their
+    # numbers come from the model as written, so long decimals are rounded.
+    d = _LONG_FLOAT_RE.sub(_round_float, _escape(str(d_raw)))
+    return None, PATH_TPL % ((d,) + style)
+
+def _render_text(el, style, tx, ty, scale, width, height, rand):
+    tx_raw = _get_num(el.get("x"), width / 2)
+    ty_raw = _get_num(el.get("y"), height / 2)
+
+    tx_final = _jitter(tx(tx_raw), rand, amount=1.2)
+    ty_final = _clamp_y(_jitter(ty(ty_raw), rand, amount=1.2), height)
+
+    content = _escape(el.get("text") or "")
+    font_size = _get_num(el.get("fontSize"), 14)
+    fill_text = _escape(str(el.get("fill", el.get("color", "#333333"))))
+    anchor = _escape(str(el.get("textAnchor", "start")))
+
+    return None, TEXT_TPL % (
+        tx_final, ty_final, anchor, font_size, fill_text, style[3], content
+    )
+
+ELEMENT_HANDLERS = {
+    "circle": _render_circle,
+    "line": _render_line,
+    "polygon": _render_polygon,
+    "path": _render_path,
+    "text": _render_text,
+}
+
+def render_visual_spec(spec: Dict[str, Any], seed: Any = None) -> str:
     canvas = spec.get("canvas", {}) or {}
     width = int(canvas.get("width", 1200))
     height = int(canvas.get("height", 800))
@@ -127,25 +307,22 @@ def render_visual_spec(spec: Dict[str, Any]) -> str:
     else:
         legend_items = raw_legend
 
-    title_text: str = spec.get("title", "") or ""
+    if len(elements) > MAX_ELEMENTS:
+        raise ValueError(
+            f"Spec has {len(elements)} elements; the limit is {MAX_ELEMENTS}."
+        )
+    if len(legend_items) > MAX_LEGEND_ITEMS:
+        raise ValueError(
+            f"Legend has {len(legend_items)} items; the limit is {MAX_LEGEND_ITEMS}."
+        )
 
-    svg_parts: List[str] = [
-        f'<svg xmlns="http://www.w3.org/2000/svg" '
-        f'viewBox="0 0 {width} {height}" '
-        f'preserveAspectRatio="xMidYMid meet" '
-        f'style="max-width:100%; height:auto; display:block; margin:0 auto;">'
-    ]
+    title_text: str = spec.get("title", "") or ""
 
-    svg_parts.append(
-        f'<rect x="0" y="0" width="{width}" height="{height}" fill="{background}" />'
-    )
+    svg_parts: List[str] = [_svg_prelude(width, height, _escape(str(background)))]
+    append = svg_parts.append
 
     if title_text:
-        svg_parts.append(
-            f'<text x="{width / 2}" y="50" text-anchor="middle" '
-            f'font-family="Dancing Script, cursive" font-size="24" fill="#222">'
-            f'{_escape(title_text)}</text>'
-        )
+        append(TITLE_TPL % (width / 2, _escape(title_text)))
 
     content_bottom = height - LEGEND_RESERVED_HEIGHT - 20
     margin_left_right = width * 0.1
@@ -190,11 +367,56 @@ def render_visual_spec(spec: Dict[str, Any]) -> str:
         def ty(y: float) -> float:
             return y
 
-    for el in elements:
-        el_type = (el.get("type") or "").lower()
+    # Consecutive circles / lines / polygons sharing fill, stroke and stroke
+    # width go into one <g> carrying those attributes; within it, unfilled
+    # marks that also share an opacity are merged into one <path>. Filled
+    # marks keep a <path> each: as subpaths of one path, overlaps with
+    # opposite winding would become holes under the nonzero fill rule.
+    # Dense specs produce far fewer DOM nodes and attributes. Paths and text
+    # close the group first, keeping the drawing order intact.
+    group_style = None
+    group_paths: List[tuple] = []
+    run_opacity = None
+    run_d: List[str] = []
+
+    def flush_path() -> None:
+        nonlocal run_opacity
+        if run_d:
+            group_paths.append((" ".join(run_d), run_opacity))
+            run_d.clear()
+        run_opacity = None
+
+    def flush_run() -> None:
+        nonlocal group_style
+        flush_path()
+        if len(group_paths) == 1:
+            d, opacity_ = group_paths[0]
+            append(PATH_TPL % ((d,) + group_style + (opacity_,)))
+        elif group_paths:
+            append(GROUP_OPEN_TPL % group_style)
+            for d, opacity_ in group_paths:
+                append(GROUP_PATH_TPL % (d, opacity_))
+            append("</g>")
+        group_paths.clear()
+        group_style = None
+
+    # Globals and bound methods used per element, resolved once
+    get_handler = ELEMENT_HANDLERS.get
+    get_num = _get_num
+    rand = random.Random(seed).random
+    run_d_append = run_d.append
 
-        if el_type not in {"circle", "line", "polygon", "path", "text"}:
+    for el in elements:
+        el_type = el.get("type")
+        # Checked before the lookup: a list/dict type isn't hashable
+        if not isinstance(el_type, str):
             continue
+        handler = get_handler(el_type)
+        if handler is None:
+            # Types almost always arrive lowercase; only odd ones pay for .lower()
+            handler = get_handler(el_type.lower())
+            if handler is None:
+                continue
 
         fill = el.get("fill", None)
         stroke = el.get("stroke", None)
@@ -205,110 +427,40 @@ def render_visual_spec(spec: Dict[str, Any]) -> str:
             fill = "none"
         if not stroke:
             stroke = "#222222"
+        # Colours come from the model, so they're escaped like any other text
+        fill = _escape(str(fill))
+        stroke = _escape(str(stroke))
 
-        stroke_width = _get_num(el.get("strokeWidth"), 2.0)
-        opacity = _get_num(el.get("opacity"), random.uniform(0.86, 1.0))
-
-        if el_type == "circle":
-            cx_raw = _get_num(el.get("x"), width / 2)
-            cy_raw = _get_num(el.get("y"), height / 2)
-            r_raw = _get_num(el.get("radius"), 8)
-
-            cx_scaled = tx(cx_raw)
-            cy_scaled = ty(cy_raw)
-
-            cx = _jitter(cx_scaled, amount=2.3)
-            cy = _clamp_y(_jitter(cy_scaled, amount=2.3), height)
-            r = max(_jitter(r_raw * scale, amount=1.0), 0.8)
-
-            svg_parts.append(
-                f'<circle cx="{cx}" cy="{cy}" r="{r}" '
-                f'fill="{fill}" stroke="{stroke}" stroke-width="{stroke_width}" '
-                f'opacity="{opacity}" />'
-            )
-
-        elif el_type == "line":
-            x1_raw = _get_num(el.get("x"), width / 2)
-            y1_raw = _get_num(el.get("y"), height / 2)
-            x2_raw = _get_num(el.get("x2"), x1_raw + 10)
-            y2_raw = _get_num(el.get("y2"), y1_raw)
-
-            x1_scaled = tx(x1_raw)
-            y1_scaled = ty(y1_raw)
-            x2_scaled = tx(x2_raw)
-            y2_scaled = ty(y2_raw)
-
-            x1 = _jitter(x1_scaled, amount=2.0)
-            y1 = _clamp_y(_jitter(y1_scaled, amount=2.0), height)
-            x2 = _jitter(x2_scaled, amount=2.0)
-            y2 = _clamp_y(_jitter(y2_scaled, amount=2.0), height)
+        stroke_width = get_num(el.get("strokeWidth"), 2.0)
+        # Rounded to what gets written, so equal-looking marks can merge
+        opacity = round(get_num(el.get("opacity"), 0.86 + 0.14 * rand()), 2)
 
-            d = _wobble_path(x1, y1, x2, y2, wobble_strength=3.0)
-
-            svg_parts.append(
-                f'<path d="{d}" fill="none" '
-                f'stroke="{stroke}" stroke-width="{stroke_width}" '
-                f'opacity="{opacity}" />'
-            )
-
-        elif el_type == "polygon":
-            pts = el.get("points") or []
-            if isinstance(pts, list) and pts:
-                jittered_points = []
-                for p in pts:
-                    if isinstance(p, (list, tuple)) and len(p) >= 2:
-                        px_raw = _get_num(p[0])
-                        py_raw = _get_num(p[1])
-                        px_scaled = tx(px_raw)
-                        py_scaled = ty(py_raw)
-                        px = _jitter(px_scaled, amount=1.8)
-                        py = _clamp_y(_jitter(py_scaled, amount=1.8), height)
-                        jittered_points.append(f"{px},{py}")
-                if jittered_points:
-                    pts_str = " ".join(jittered_points)
-                    svg_parts.append(
-                        f'<polygon points="{pts_str}" fill="{fill}" '
-                        f'stroke="{stroke}" stroke-width="{stroke_width}" '
-                        f'opacity="{opacity}" />'
-                    )
-
-        elif el_type == "path":
-            d_raw = el.get("d") or ""
-            if d_raw:
-                d = _escape(d_raw)
-                svg_parts.append(
-                    f'<path d="{d}" fill="{fill}" '
-                    f'stroke="{stroke}" stroke-width="{stroke_width}" '
-                    f'opacity="{opacity}" />'
-                )
-
-        elif el_type == "text":
-            tx_raw = _get_num(el.get("x"), width / 2)
-            ty_raw = _get_num(el.get("y"), height / 2)
-
-            tx_scaled_val = tx(tx_raw)
-            ty_scaled_val = ty(ty_raw)
-
-            tx_final = _jitter(tx_scaled_val, amount=1.2)
-            ty_final = _clamp_y(_jitter(ty_scaled_val, amount=1.2), height)
-
-            content = _escape(el.get("text") or "")
-            font_size = _get_num(el.get("fontSize"), 14)
-            fill_text = el.get("fill", el.get("color", "#333333"))
-            anchor = el.get("textAnchor", "start")
+        mark = handler(
+            el, (fill, stroke, stroke_width, opacity), tx, ty, scale, width, height, rand
+        )
+        if mark is None:
+            continue
+        mark_style, markup = mark
+        if mark_style is not None:
+            if mark_style[:3] != group_style:
+                flush_run()
+                group_style = mark_style[:3]
+            if mark_style[3] != run_opacity or mark_style[0] != "none":
+                flush_path()
+                run_opacity = mark_style[3]
+            run_d_append(markup)
+        else:
+            flush_run()
+            append(markup)
 
-            svg_parts.append(
-                f'<text x="{tx_final}" y="{ty_final}" text-anchor="{anchor}" '
-                f'font-family="Dancing Script, cursive" font-size="{font_size}" '
-                f'fill="{fill_text}" opacity="{opacity}">{content}</text>'
-            )
+    flush_run()
 
     if legend_items:
         legend_top = height - LEGEND_RESERVED_HEIGHT + 30
         legend_left = 70
         line_height = 24
 
-        svg_parts.append(
+        append(
             f'<text x="{legend_left}" y="{legend_top - 10}" '
             f'font-family="Dancing Script, cursive" font-size="18" '
             f'fill="#222">{_escape(legend_title)}</text>'
@@ -318,26 +470,19 @@ def render_visual_spec(spec: Dict[str, Any]) -> str:
             if not isinstance(item, dict):
                 continue
             ly = legend_top + idx * line_height
-            color = item.get("color", "#222222")
+            color = _escape(str(item.get("color", "#222222")))
             label = _escape(item.get("label", ""))
 
             shape = item.get("shape", "circle")  # Shape variation
             if shape == "circle":
-                svg_parts.append(
-                    f'<circle cx="{legend_left}" cy="{ly}" r="5" '
-                    f'fill="{color}" stroke="#222" stroke-width="0.7" />'
-                )
+                append(LEGEND_CIRCLE_TPL % (legend_left, ly, color))
             elif shape == "triangle":
-                svg_parts.append(
-                    f'<polygon points="{legend_left-5},{ly+7} {legend_left+5},{ly+7} {legend_left},{ly-5}" '
-                    f'fill="{color}" stroke="#222" stroke-width="0.7" />'
+                append(
+                    LEGEND_TRIANGLE_TPL
+                    % (legend_left - 5, ly + 7, legend_left + 5, ly + 7, legend_left, ly - 5, color)
                 )
 
-            svg_parts.append(
-                f'<text x="{legend_left + 18}" y="{ly + 4}" '
-                f'font-family="Dancing Script, cursive" font-size="13" '
-                f'fill="#222">{label}</text>'
-            )
+            append(LEGEND_LABEL_TPL % (legend_left + 18, ly + 4, label))
 
-    svg_parts.append("</svg>")
+    append("</svg>")
     return "".join(svg_parts)
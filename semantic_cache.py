@@ -0,0 +1,76 @@
+# semantic_cache.py
+
+"""
+A tiny in-memory semantic cache for visual specs.
+
+Exact-match caching misses prompts that differ only by a reworded
+context line or a near-identical paste. Here we keep the embedding of
+every prompt we generated a spec for, and reuse a cached spec when a new
+prompt's embedding is close enough (cosine similarity above a threshold).
+
+The cache lives in st.session_state, so it is per-user and small.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Store (embedding, visual_spec) pairs and look up near-duplicates.
+
+    Usage:
+        cache = SemanticCache()
+        spec = cache.lookup(embedding)
+        if spec is None:
+            spec = ...
+            cache.add(embedding, spec)
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 64):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._matrix: Optional[np.ndarray] = None
+        self._specs: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if vec.ndim != 1 or norm == 0.0:
+            return None
+        return vec / norm
+
+    def lookup(self, embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """Return the closest cached spec, or None if nothing is similar enough."""
+        if self._matrix is None:
+            return None
+
+        vec = self._normalize(embedding)
+        if vec is None or vec.shape[0] != self._matrix.shape[1]:
+            return None
+
+        # Rows are unit vectors, so a dot product is the cosine similarity.
+        scores = self._matrix @ vec
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self._specs[best]
+
+    def add(self, embedding: Sequence[float], spec: Dict[str, Any]) -> None:
+        """Remember a spec under its prompt embedding (oldest entries drop first)."""
+        vec = self._normalize(embedding)
+        if vec is None:
+            return
+
+        if self._matrix is None or vec.shape[0] != self._matrix.shape[1]:
+            self._matrix = vec[np.newaxis, :]
+            self._specs = [spec]
+            return
+
+        self._matrix = np.vstack([self._matrix, vec])[-self.max_entries:]
+        self._specs = (self._specs + [spec])[-self.max_entries:]
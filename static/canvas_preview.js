@@ -0,0 +1,32 @@
+/* Rasterise the postcard SVG onto a single <canvas> (lives inside its own iframe).
+   The browser then paints one bitmap instead of laying out every SVG node. */
+
+(function () {
+    var canvas = document.getElementById("preview-canvas");
+    var w = Number(canvas.dataset.width);
+    var h = Number(canvas.dataset.height);
+    var svg = JSON.parse(document.getElementById("svg-source").textContent);
+
+    /* Some browsers can't draw an SVG image without an intrinsic size */
+    svg = svg.replace("<svg ", '<svg width="' + w + '" height="' + h + '" ');
+
+    var url = URL.createObjectURL(new Blob([svg], { type: "image/svg+xml" }));
+    var img = new Image();
+
+    img.onload = function () {
+        var cssWidth = canvas.parentElement.clientWidth;
+        var cssHeight = cssWidth * h / w;
+        var dpr = window.devicePixelRatio || 1;
+
+        canvas.style.width = cssWidth + "px";
+        canvas.style.height = cssHeight + "px";
+        canvas.width = Math.round(cssWidth * dpr);
+        canvas.height = Math.round(cssHeight * dpr);
+
+        window.requestAnimationFrame(function () {
+            canvas.getContext("2d").drawImage(img, 0, 0, canvas.width, canvas.height);
+            URL.revokeObjectURL(url);
+        });
+    };
+    img.src = url;
+})();
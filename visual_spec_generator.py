@@ -12,33 +12,150 @@ Flow:
 """
 
 import json
+import re
 import textwrap
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional
 
 from gemini_client import GeminiClient
 
 
 SYSTEM_PROMPT_PATH = Path(__file__).parent / "prompts" / "system_prompt.txt"
 
+# Prompt templates are dedented once at import. Dedenting them per call
+# would also scan the interpolated user data, and any unindented line in
+# that data would stop the template's own indentation from being removed.
+_FALLBACK_SYSTEM_PROMPT = textwrap.dedent(
+    """
+    You are a system that outputs ONLY valid JSON describing a visual
+    specification with keys: canvas, elements, legend, title.
+    Never include any explanation or markdown, only raw JSON.
+    """
+).strip()
+
+_REPAIR_SYSTEM_PROMPT = textwrap.dedent(
+    """
+    You are a JSON repair assistant.
+
+    You are given some text that SHOULD have been a JSON object describing
+    a visual specification, but may contain extra commentary, markdown
+    fences, or invalid JSON.
+
+    Your job:
+    - Read the provided text.
+    - Infer the intended JSON object if possible.
+    - Output ONLY a single JSON object with this structure:
+
+      {
+        "canvas": { "width": number, "height": number, "background": "#hex" },
+        "elements": [ ... ],
+        "legend": [ ... ],
+        "title": "..."
+      }
+
+    Rules:
+    - No markdown fences.
+    - No explanation.
+    - No prose.
+    - Just the JSON.
+    """
+).strip()
+
+_REPAIR_USER_TEMPLATE = textwrap.dedent(
+    """
+    Here is the previous (possibly invalid) output:
+
+    ---- START RAW TEXT ----
+    {raw_text}
+    ---- END RAW TEXT ----
+
+    Convert this into a single valid JSON object following the schema.
+    """
+).strip()
+
+_USER_PROMPT_TEMPLATE = textwrap.dedent(
+    """
+    The following is user-provided data and context.
+
+    Your task:
+    - Understand the patterns, categories, sequences, and emotions.
+    - Design a "Dear Data" style postcard visual specification.
+    - Output ONLY a valid JSON object using the exact schema described
+      in the system instructions (canvas, elements, legend, title).
+
+    USER DATA START
+    ---------------
+    {input_data}
+    ---------------
+    USER DATA END
+    """
+).strip()
+
 
 # ---------------------------------------------------------
-# Helpers: load system prompt and extract JSON from text
+# Helpers: load system prompt
 # ---------------------------------------------------------
 def _load_system_prompt() -> str:
     """Load the Giorgia Lupi / Dear Data system prompt from file."""
     if not SYSTEM_PROMPT_PATH.exists():
-        return textwrap.dedent(
-            """
-            You are a system that outputs ONLY valid JSON describing a visual
-            specification with keys: canvas, elements, legend, title.
-            Never include any explanation or markdown, only raw JSON.
-            """
-        ).strip()
+        return _FALLBACK_SYSTEM_PROMPT
 
     return SYSTEM_PROMPT_PATH.read_text(encoding="utf-8").strip()
 
 
+# ---------------------------------------------------------
+# Prompt building
+# ---------------------------------------------------------
+# Roughly 8k tokens. Big CSV/XLSX uploads can run far past this, and Gemini
+# latency grows with prompt size; a postcard doesn't need every row.
+MAX_DATA_CHARS = 32000
+
+
+def _shrink(text: str, max_chars: int = MAX_DATA_CHARS) -> str:
+    """
+    Keep the head and tail of over-long text, cut on line boundaries.
+
+    Deterministic, so the same upload always yields the same prompt (and
+    the same cache keys downstream).
+    """
+    if len(text) <= max_chars:
+        return text
+
+    half = max_chars // 2
+    head = text[:half]
+    tail = text[-half:]
+    # Don't hand Gemini half a row at either cut
+    if "\n" in head:
+        head = head[: head.rindex("\n")]
+    if "\n" in tail:
+        tail = tail[tail.index("\n") + 1 :]
+    omitted = len(text) - len(head) - len(tail)
+    return f"{head}\n...[{omitted} characters truncated]...\n{tail}"
+
+
+@lru_cache(maxsize=16)
+def build_combined_input(data_type: str, context: str, parsed_data: str) -> str:
+    """
+    Combine meta info + parsed content into a single prompt string.
+
+    Memoised here rather than in app.py: Streamlit re-executes app.py on
+    every rerun, so a cache defined there would be rebuilt each time.
+    """
+    # A single f-string: dedent/strip would each scan the whole parsed text
+    return (
+        f"DATA TYPE: {data_type}\n"
+        f"DESCRIPTION: {context or 'Not provided'}\n"
+        "\n"
+        "RAW DATA BELOW:\n"
+        "----------------\n"
+        f"{_shrink(parsed_data)}"
+    )
+
+
+# ---------------------------------------------------------
+# JSON extraction
+# ---------------------------------------------------------
 def _extract_json_from_text(raw_text: str) -> Dict[str, Any]:
     """
     Try to pull a JSON object out of model text.
@@ -55,11 +172,14 @@ def _extract_json_from_text(raw_text: str) -> Dict[str, Any]:
         if text.endswith("```"):
             text = text[:-3].strip()
 
-    # 1) Direct attempt
+    # 1) Direct attempt (the usual case: Gemini runs in JSON output mode)
     try:
-        return json.loads(text)
+        parsed = json.loads(text)
     except json.JSONDecodeError:
         pass
+    else:
+        if isinstance(parsed, dict):
+            return parsed
 
     # 2) Slice between first '{' and last '}'
     start = text.find("{")
@@ -67,13 +187,57 @@ def _extract_json_from_text(raw_text: str) -> Dict[str, Any]:
     if start != -1 and end != -1 and end > start:
         candidate = text[start : end + 1]
         try:
-            return json.loads(candidate)
+            parsed = json.loads(candidate)
         except json.JSONDecodeError:
             pass
+        else:
+            if isinstance(parsed, dict):
+                return parsed
 
     raise ValueError("Could not extract valid JSON from Gemini response.")
 
 
+def parse_partial_spec(buffer: str) -> Dict[str, Any]:
+    """
+    Best-effort parse of a spec that is still streaming in.
+
+    Returns the canvas (once it is complete) and every element object
+    that has fully arrived so far, so the app can draw a rough preview
+    before the whole JSON document is available.
+    """
+    decoder = json.JSONDecoder()
+    spec: Dict[str, Any] = {}
+
+    match = re.search(r'"canvas"\s*:\s*', buffer)
+    if match:
+        try:
+            canvas, _ = decoder.raw_decode(buffer, match.end())
+        except ValueError:
+            canvas = None
+        if isinstance(canvas, dict):
+            spec["canvas"] = canvas
+
+    elements = []
+    match = re.search(r'"elements"\s*:\s*\[', buffer)
+    if match:
+        pos = match.end()
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer) or buffer[pos] != "{":
+                break
+            try:
+                element, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # The next element is still incomplete
+                break
+            if isinstance(element, dict):
+                elements.append(element)
+
+    spec["elements"] = elements
+    return spec
+
+
 # ---------------------------------------------------------
 # JSON repair: second-pass call to Gemini
 # ---------------------------------------------------------
@@ -88,49 +252,12 @@ def _repair_json_with_gemini(
       - ONLY a valid JSON object
       - matching the required schema
     """
-    repair_system = textwrap.dedent(
-        """
-        You are a JSON repair assistant.
-
-        You are given some text that SHOULD have been a JSON object describing
-        a visual specification, but may contain extra commentary, markdown
-        fences, or invalid JSON.
-
-        Your job:
-        - Read the provided text.
-        - Infer the intended JSON object if possible.
-        - Output ONLY a single JSON object with this structure:
-
-          {
-            "canvas": { "width": number, "height": number, "background": "#hex" },
-            "elements": [ ... ],
-            "legend": [ ... ],
-            "title": "..."
-          }
-
-        Rules:
-        - No markdown fences.
-        - No explanation.
-        - No prose.
-        - Just the JSON.
-        """
-    ).strip()
-
-    repair_user = textwrap.dedent(
-        f"""
-        Here is the previous (possibly invalid) output:
-
-        ---- START RAW TEXT ----
-        {raw_text}
-        ---- END RAW TEXT ----
-
-        Convert this into a single valid JSON object following the schema.
-        """
-    ).strip()
+    repair_user = _REPAIR_USER_TEMPLATE.format(raw_text=raw_text)
 
     repaired_text = gemini.generate(
-        system_instruction=repair_system,
+        system_instruction=_REPAIR_SYSTEM_PROMPT,
         user_content=repair_user,
+        json_output=True,
     )
 
     # Now try to extract JSON from the repaired text
@@ -140,7 +267,11 @@ def _repair_json_with_gemini(
 # ---------------------------------------------------------
 # Main entrypoint
 # ---------------------------------------------------------
-def generate_visual_spec(input_data: str, gemini: GeminiClient) -> Dict[str, Any]:
+def generate_visual_spec(
+    input_data: str,
+    gemini: GeminiClient,
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
     """
     Called from app.py.
 
@@ -150,6 +281,10 @@ def generate_visual_spec(input_data: str, gemini: GeminiClient) -> Dict[str, Any
         - short description
         - raw text / parsed file contents
 
+    on_chunk:
+        Optional progress callback. When given, the first Gemini call is
+        streamed and on_chunk receives the partial text as it arrives.
+
     Returns:
         A dict with at least: canvas, elements, legend, title.
     """
@@ -163,28 +298,14 @@ def generate_visual_spec(input_data: str, gemini: GeminiClient) -> Dict[str, Any
 
     system_prompt = _load_system_prompt()
 
-    user_prompt = textwrap.dedent(
-        f"""
-        The following is user-provided data and context.
-
-        Your task:
-        - Understand the patterns, categories, sequences, and emotions.
-        - Design a "Dear Data" style postcard visual specification.
-        - Output ONLY a valid JSON object using the exact schema described
-          in the system instructions (canvas, elements, legend, title).
-
-        USER DATA START
-        ---------------
-        {input_data}
-        ---------------
-        USER DATA END
-        """
-    ).strip()
+    user_prompt = _USER_PROMPT_TEMPLATE.format(input_data=input_data)
 
     # 1) First call: ask Gemini to design the spec
     raw_response_text = gemini.generate(
         system_instruction=system_prompt,
         user_content=user_prompt,
+        on_chunk=on_chunk,
+        json_output=True,
     )
 
     # 2) Try parsing the first response